@@ -120,6 +120,23 @@ def get_game_by_field(value, field="slug"):
     return {}
 
 
+def get_game_by_any_field(value, fields=("id", "slug", "installer_slug")):
+    """Query a game matching `value` on any of the given database fields in a
+    single query. Matches on the first fields take precedence over the next ones.
+    """
+    for field in fields:
+        if field not in ("slug", "installer_slug", "id", "configpath"):
+            raise ValueError("Can't query by field '%s'" % field)
+    query = "SELECT * FROM games WHERE {} ORDER BY CASE {} END LIMIT 1".format(
+        " OR ".join("{} = ?".format(field) for field in fields),
+        " ".join("WHEN {} = ? THEN {}".format(field, index) for index, field in enumerate(fields))
+    )
+    game_result = sql.db_query(settings.PGA_DB, query, (value, ) * len(fields) * 2)
+    if game_result:
+        return game_result[0]
+    return {}
+
+
 def get_games_by_runner(runner):
     """Return all games using a specific runner"""
     return sql.db_select(settings.PGA_DB, "games", condition=("runner", runner))
@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import json
 import logging
 import os
@@ -39,20 +40,22 @@ from lutris.database import games as games_db
 from lutris.game import Game
 from lutris.installer import get_installers
 from lutris.gui.dialogs import ErrorDialog, InstallOrPlayDialog, LutrisInitDialog
-from lutris.gui.dialogs.issue import IssueReportWindow
-from lutris.gui.installerwindow import InstallerWindow
-from lutris.gui.widgets.status_icon import LutrisStatusIcon
 from lutris.migrations import migrate
-from lutris.startup import init_lutris, run_all_checks, update_runtime
+from lutris.startup import init_lutris, is_runtime_check_stale, run_all_checks, update_runtime
 from lutris.util import datapath, log
 from lutris.util.http import HTTPError, Request
 from lutris.util.log import logger
-from lutris.util.steam.appmanifest import AppManifest, get_appmanifests
-from lutris.util.steam.config import get_steamapps_paths
-from lutris.services import get_enabled_services
 from lutris.database.services import ServiceGameCollection
 
-from .lutriswindow import LutrisWindow
+EMPTY_LUTRIS_ACTION = {"game_slug": None, "revision": None, "action": None, "service": None, "appid": None}
+
+# Database fields used to look up the game of each URL action.
+# Installers can use game or installer slugs.
+LUTRIS_ACTION_FIELDS = {
+    "rungameid": ("id", ),
+    "rungame": ("slug", ),
+    "install": ("slug", "installer_slug"),
+}
 
 
 class Application(Gtk.Application):
@@ -63,28 +66,37 @@ class Application(Gtk.Application):
             flags=Gio.ApplicationFlags.HANDLES_COMMAND_LINE,
         )
 
-        GObject.add_emission_hook(Game, "game-launch", self.on_game_launch)
-        GObject.add_emission_hook(Game, "game-start", self.on_game_start)
-        GObject.add_emission_hook(Game, "game-stop", self.on_game_stop)
-        GObject.add_emission_hook(Game, "game-install", self.on_game_install)
-
         GLib.set_application_name(_("Lutris"))
         self.window = None
 
         self.running_games = Gio.ListStore.new(Game)
+        self._running_by_id = {}
         self.app_windows = {}
         self.tray = None
-        self.css_provider = Gtk.CssProvider.new()
+        self.css_provider = None
         self.run_in_background = False
+        self.reload_settings_cache()
+
+        # Use stdout to output logs, only if no command line argument is
+        # provided. This only depends on the arguments the process was started
+        # with so it is done once here rather than on each command line.
+        self._stdout_logging = not any(arg not in ("-d", "--debug") for arg in sys.argv[1:])
+        if self._stdout_logging:
+            # Switch back the log output to stderr (the default in Python)
+            # to avoid messing with any output from command line options.
+
+            # Use when targetting Python 3.7 minimum
+            # console_handler.setStream(sys.stderr)
+
+            # Until then...
+            logger.removeHandler(log.console_handler)
+            log.console_handler = logging.StreamHandler(stream=sys.stdout)
+            log.console_handler.setFormatter(log.SIMPLE_FORMATTER)
+            logger.addHandler(log.console_handler)
 
         if os.geteuid() == 0:
             ErrorDialog(_("Running Lutris as root is not recommended and may cause unexpected issues"))
 
-        try:
-            self.css_provider.load_from_path(os.path.join(datapath.get(), "ui", "lutris.css"))
-        except GLib.Error as e:
-            logger.exception(e)
-
         if hasattr(self, "add_main_option"):
             self.add_arguments()
         else:
@@ -189,6 +201,14 @@ class Application(Gtk.Application):
             _("Reinstall game"),
             None,
         )
+        self.add_main_option(
+            "force-checks",
+            0,
+            GLib.OptionFlags.NONE,
+            GLib.OptionArg.NONE,
+            _("Run the migrations and startup checks even for listing commands"),
+            None,
+        )
         self.add_main_option("submit-issue", 0, GLib.OptionFlags.NONE, GLib.OptionArg.NONE, _("Submit an issue"), None)
         self.add_main_option(
             GLib.OPTION_REMAINING,
@@ -209,9 +229,35 @@ class Application(Gtk.Application):
         self.add_action(action)
         self.add_accelerator("<Primary>q", "app.quit")
 
+    def reload_settings_cache(self):
+        """Read again the settings checked on each game start and stop"""
+        self._hide_client_on_start = settings.read_setting("hide_client_on_game_start") == "True"
+
+    def _ensure_gui_initialized(self):
+        """Register the game signal hooks and load the CSS, only needed once
+        the graphical part of the application is activated."""
+        if self.css_provider:
+            return
+        game_hooks = {
+            "game-launch": self.on_game_launch,
+            "game-start": self.on_game_start,
+            "game-stop": self.on_game_stop,
+            "game-install": self.on_game_install,
+        }
+        for signal_name, callback in game_hooks.items():
+            GObject.add_emission_hook(Game, signal_name, callback)
+
+        self.css_provider = Gtk.CssProvider.new()
+        try:
+            self.css_provider.load_from_path(os.path.join(datapath.get(), "ui", "lutris.css"))
+        except GLib.Error as e:
+            logger.exception(e)
+
     def do_activate(self):  # pylint: disable=arguments-differ
+        self._ensure_gui_initialized()
         Application.show_update_runtime_dialog()
         if not self.window:
+            from lutris.gui.lutriswindow import LutrisWindow
             self.window = LutrisWindow(application=self)
             screen = self.window.props.screen  # pylint: disable=no-member
             Gtk.StyleContext.add_provider_for_screen(screen, self.css_provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
@@ -226,6 +272,8 @@ class Application(Gtk.Application):
     def show_update_runtime_dialog():
         if os.environ.get("LUTRIS_SKIP_INIT"):
             logger.debug("Skipping initialization")
+        elif not is_runtime_check_stale():
+            logger.debug("Runtime updates checked recently, skipping")
         else:
             init_dialog = LutrisInitDialog(update_runtime)
             init_dialog.run()
@@ -239,7 +287,8 @@ class Application(Gtk.Application):
             return kwargs["installers"][0]["game_slug"]
         if kwargs.get("game"):
             return str(kwargs["game"].id)
-        return str(kwargs)
+        # Avoid stringifying the values, their repr can be expensive
+        return repr(sorted((key, id(value)) for key, value in kwargs.items()))
 
     def show_window(self, window_class, **kwargs):
         """Instanciate a window keeping 1 instance max
@@ -251,7 +300,8 @@ class Application(Gtk.Application):
         Returns:
             Gtk.Window: the existing window instance or a newly created one
         """
-        window_key = str(window_class.__name__) + self.get_window_key(**kwargs)
+        window_key_suffix = self.get_window_key(**kwargs)
+        window_key = window_class.__name__ + window_key_suffix
         if self.app_windows.get(window_key):
             self.app_windows[window_key].present()
             return self.app_windows[window_key]
@@ -263,13 +313,14 @@ class Application(Gtk.Application):
             window_inst.set_application(self)
         else:
             window_inst = window_class(application=self, **kwargs)
-        window_inst.connect("destroy", self.on_app_window_destroyed, self.get_window_key(**kwargs))
+        window_inst.connect("destroy", self.on_app_window_destroyed, window_key_suffix)
         self.app_windows[window_key] = window_inst
         logger.debug("Showing window %s", window_key)
         window_inst.show()
         return window_inst
 
     def show_installer_window(self, installers, service=None, appid=None):
+        from lutris.gui.installerwindow import InstallerWindow
         self.show_window(
             InstallerWindow,
             installers=installers,
@@ -285,7 +336,8 @@ class Application(Gtk.Application):
             logger.debug("Removed window %s", window_key)
         except KeyError:
             logger.warning("Failed to remove window %s", window_key)
-            logger.info("Available windows: %s", ", ".join(self.app_windows.keys()))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Available windows: %s", ", ".join(self.app_windows.keys()))
         return True
 
     @staticmethod
@@ -307,24 +359,6 @@ class Application(Gtk.Application):
         # TODO: split into multiple methods to reduce complexity (35)
         options = command_line.get_options_dict()
 
-        # Use stdout to output logs, only if no command line argument is
-        # provided
-        argc = len(sys.argv) - 1
-        if "-d" in sys.argv or "--debug" in sys.argv:
-            argc -= 1
-        if not argc:
-            # Switch back the log output to stderr (the default in Python)
-            # to avoid messing with any output from command line options.
-
-            # Use when targetting Python 3.7 minimum
-            # console_handler.setStream(sys.stderr)
-
-            # Until then...
-            logger.removeHandler(log.console_handler)
-            log.console_handler = logging.StreamHandler(stream=sys.stdout)
-            log.console_handler.setFormatter(log.SIMPLE_FORMATTER)
-            logger.addHandler(log.console_handler)
-
         # Set up logger
         if options.contains("debug"):
             log.console_handler.setFormatter(log.DEBUG_FORMATTER)
@@ -340,13 +374,17 @@ class Application(Gtk.Application):
             return 0
 
         init_lutris()
-        migrate()
-        run_all_checks()
+        # Read-only listings don't need the migrations and startup checks
+        is_readonly = (
+            any(options.contains(option) for option in ("list-games", "list-steam-games", "list-steam-folders"))
+            and not options.contains("install")
+        )
+        if not is_readonly or options.contains("force-checks"):
+            migrate()
+            run_all_checks()
         # List game
         if options.contains("list-games"):
-            game_list = games_db.get_games()
-            if options.contains("installed"):
-                game_list = [game for game in game_list if game["installed"]]
+            game_list = games_db.get_games(filters={"installed": 1} if options.contains("installed") else None)
             if options.contains("json"):
                 self.print_game_json(command_line, game_list)
             else:
@@ -368,6 +406,7 @@ class Application(Gtk.Application):
             return 0
 
         if options.contains("submit-issue"):
+            from lutris.gui.dialogs.issue import IssueReportWindow
             IssueReportWindow(application=self)
             return 0
 
@@ -393,7 +432,7 @@ class Application(Gtk.Application):
             installer_file = options.lookup_value("install").get_string()
             if installer_file.startswith(("http:", "https:")):
                 try:
-                    request = Request(installer_file).get()
+                    request = Request(installer_file).get(stream=True)
                 except HTTPError:
                     self._print(command_line, _("Failed to download %s") % installer_file)
                     return 1
@@ -405,8 +444,11 @@ class Application(Gtk.Application):
                 file_path = os.path.join(tempfile.gettempdir(), file_name)
                 self._print(command_line, _("download {url} to {file} started").format(
                     url=installer_file, file=file_path))
-                with open(file_path, 'wb') as dest_file:
-                    dest_file.write(request.content)
+                try:
+                    request.write_to_file(file_path)
+                except HTTPError:
+                    self._print(command_line, _("Failed to download %s") % installer_file)
+                    return 1
                 installer_file = file_path
                 action = "install"
             else:
@@ -419,26 +461,13 @@ class Application(Gtk.Application):
 
         db_game = None
         if game_slug and not service:
-            if action == "rungameid":
-                # Force db_game to use game id
-                self.run_in_background = True
-                db_game = games_db.get_game_by_field(game_slug, "id")
-            elif action == "rungame":
-                # Force db_game to use game slug
+            if action in LUTRIS_ACTION_FIELDS:
                 self.run_in_background = True
-                db_game = games_db.get_game_by_field(game_slug, "slug")
-            elif action == "install":
-                # Installers can use game or installer slugs
-                self.run_in_background = True
-                db_game = games_db.get_game_by_field(game_slug, "slug") \
-                    or games_db.get_game_by_field(game_slug, "installer_slug")
-            else:
-                # Dazed and confused, try anything that might works
-                db_game = (
-                    games_db.get_game_by_field(game_slug, "id")
-                    or games_db.get_game_by_field(game_slug, "slug")
-                    or games_db.get_game_by_field(game_slug, "installer_slug")
-                )
+            # Dazed and confused without a known action, try anything that might works
+            db_game = games_db.get_game_by_any_field(
+                game_slug,
+                LUTRIS_ACTION_FIELDS.get(action, ("id", "slug", "installer_slug"))
+            )
 
         # If reinstall flag is passed, force the action to install
         if options.contains("reinstall"):
@@ -473,6 +502,7 @@ class Application(Gtk.Application):
         if service:
             service_game = ServiceGameCollection.get_game(service, appid)
             if service_game:
+                from lutris.services import get_enabled_services
                 service = get_enabled_services()[service]()
                 service.install(service_game)
                 return 0
@@ -502,13 +532,15 @@ class Application(Gtk.Application):
 
     def on_game_start(self, game):
         self.running_games.append(game)
-        if settings.read_setting("hide_client_on_game_start") == "True":
+        self._running_by_id[str(game.id)] = game
+        if self._hide_client_on_start:
             self.window.hide()  # Hide launcher window
         return True
 
     def on_game_install(self, game):
         """Request installation of a game"""
         if game.service and game.service != "lutris":
+            from lutris.services import get_enabled_services
             service = get_enabled_services()[game.service]()
             db_game = ServiceGameCollection.get_game(service.id, game.appid)
 
@@ -533,102 +565,139 @@ class Application(Gtk.Application):
         return True
 
     def get_running_game_ids(self):
-        ids = []
-        for i in range(self.running_games.get_n_items()):
-            game = self.running_games.get_item(i)
-            ids.append(str(game.id))
-        return ids
+        return list(self._running_by_id)
 
     def get_game_by_id(self, game_id):
-        for i in range(self.running_games.get_n_items()):
-            game = self.running_games.get_item(i)
-            if str(game.id) == str(game_id):
-                return game
-        return None
+        return self._running_by_id.get(str(game_id))
 
     def on_game_stop(self, game):
         """Callback to remove the game from the running games"""
-        ids = self.get_running_game_ids()
-        if str(game.id) in ids:
-            try:
-                self.running_games.remove(ids.index(str(game.id)))
-            except ValueError:
-                pass
+        game_id = str(game.id)
+        if self._running_by_id.pop(game_id, None):
+            # The list store is only kept for UI bindings, find the position
+            # of the game in a single pass.
+            for i, item in enumerate(self.running_games):
+                if str(item.id) == game_id:
+                    self.running_games.remove(i)
+                    break
         else:
-            logger.warning("%s not in %s", game.id, ids)
+            logger.warning("%s not in %s", game.id, list(self._running_by_id))
 
+        # Let the emission hook return before notifying the other handlers;
+        # game-stopped is emitted on the next main loop iteration.
+        GLib.idle_add(self.on_game_stopped, game)
+        return True
+
+    def on_game_stopped(self, game):
+        """Notify that a game has stopped, once it has been removed from the running games"""
         game.emit("game-stopped")
-        if settings.read_setting("hide_client_on_game_start") == "True":
+        if self._hide_client_on_start:
             self.window.show()  # Show launcher window
         elif not self.window.is_visible():
             if self.running_games.get_n_items() == 0:
                 self.quit()
-        return True
+        return False
 
     @staticmethod
     def get_lutris_action(url):
-        installer_info = {"game_slug": None, "revision": None, "action": None, "service": None, "appid": None}
-
-        if url:
-            url = url.get_strv()
-
-        if url:
-            url = url[0]
-            installer_info = parse_installer_url(url)
-            if installer_info is False:
-                raise ValueError
+        """Return the action described by a lutris: URL. The returned dict
+        is shared when no URL is given and must not be modified.
+        """
+        if not url:
+            return EMPTY_LUTRIS_ACTION
+        urls = url.get_strv()
+        if not urls:
+            return EMPTY_LUTRIS_ACTION
+        installer_info = parse_installer_url(urls[0])
+        if installer_info is False:
+            raise ValueError
         return installer_info
 
     def print_game_list(self, command_line, game_list):
-        for game in game_list:
-            self._print(
-                command_line,
-                "{:4} | {:<40} | {:<40} | {:<15} | {:<64}".format(
-                    game["id"],
-                    game["name"][:40],
-                    game["slug"][:40],
-                    game["runner"] or "-",
-                    game["directory"] or "-",
-                ),
+        # The .40 precision truncates the name and slug columns
+        line_format = "{:4} | {:<40.40} | {:<40.40} | {:<15} | {:<64}".format
+        lines = [
+            line_format(
+                game["id"],
+                game["name"],
+                game["slug"],
+                game["runner"] or "-",
+                game["directory"] or "-",
             )
-
-    def print_game_json(self, command_line, game_list):
-        games = [
-            {
-                "id": game["id"],
-                "slug": game["slug"],
-                "name": game["name"],
-                "runner": game["runner"],
-                "platform": game["platform"] or None,
-                "year": game["year"] or None,
-                "directory": game["directory"] or None,
-                "hidden": bool(game["hidden"]),
-                "playtime": (
-                    str(timedelta(hours=game["playtime"]))
-                    if game["playtime"] else None
-                ),
-                "lastplayed": (
-                    str(datetime.fromtimestamp(game["lastplayed"]))
-                    if game["lastplayed"] else None
-                )
-            } for game in game_list
+            for game in game_list
         ]
-        self._print(command_line, json.dumps(games, indent=2))
+        if lines:
+            self._print(command_line, "\n".join(lines))
+
+    @staticmethod
+    def _get_game_json(game):
+        return {
+            "id": game["id"],
+            "slug": game["slug"],
+            "name": game["name"],
+            "runner": game["runner"],
+            "platform": game["platform"] or None,
+            "year": game["year"] or None,
+            "directory": game["directory"] or None,
+            "hidden": bool(game["hidden"]),
+            "playtime": (
+                str(timedelta(hours=game["playtime"]))
+                if game["playtime"] else None
+            ),
+            "lastplayed": (
+                str(datetime.fromtimestamp(game["lastplayed"]))
+                if game["lastplayed"] else None
+            )
+        }
+
+    def _iter_game_json(self, game_list):
+        """Encode the games as an indented JSON array, one game at a time"""
+        separator = "[\n  "
+        for game in game_list:
+            yield separator + json.dumps(self._get_game_json(game), indent=2).replace("\n", "\n  ")
+            separator = ",\n  "
+        yield "[]" if separator.startswith("[") else "\n]"
+
+    def print_game_json(self, command_line, game_list, buffer_size=64 * 1024):
+        """Print the games in JSON format, flushing the output every
+        `buffer_size` characters instead of building the whole document first.
+        """
+        # Workaround broken pygobject bindings, see _print
+        print_literal = command_line.do_print_literal
+        chunks = []
+        chunks_size = 0
+        for chunk in self._iter_game_json(game_list):
+            chunks.append(chunk)
+            chunks_size += len(chunk)
+            if chunks_size >= buffer_size:
+                print_literal(command_line, "".join(chunks))
+                chunks = []
+                chunks_size = 0
+        chunks.append("\n")
+        print_literal(command_line, "".join(chunks))
 
     def print_steam_list(self, command_line):
+        from lutris.util.steam.appmanifest import AppManifest, get_appmanifest_paths
+        from lutris.util.steam.config import get_steamapps_paths
         steamapps_paths = get_steamapps_paths()
-        for path in steamapps_paths if steamapps_paths else []:
-            appmanifest_files = get_appmanifests(path)
-            for appmanifest_file in appmanifest_files:
-                appmanifest = AppManifest(os.path.join(path, appmanifest_file))
-                self._print(
-                    command_line,
-                    " {:8} | {:<60} | {}".format(
-                        appmanifest.steamid,
-                        appmanifest.name or "-",
-                        ", ".join(appmanifest.states),
-                    ),
-                )
+        appmanifest_paths = [
+            appmanifest_path
+            for path in steamapps_paths or []
+            for appmanifest_path in get_appmanifest_paths(path)
+        ]
+        # Parsing the manifests is I/O bound, read them in parallel
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            appmanifests = list(executor.map(AppManifest, appmanifest_paths))
+        lines = [
+            " {:8} | {:<60} | {}".format(
+                appmanifest.steamid,
+                appmanifest.name or "-",
+                ", ".join(appmanifest.states),
+            )
+            for appmanifest in appmanifests
+        ]
+        if lines:
+            self._print(command_line, "\n".join(lines))
 
     @staticmethod
     def execute_command(command):
@@ -644,10 +713,10 @@ class Application(Gtk.Application):
             monitored_command.stop()
 
     def print_steam_folders(self, command_line):
+        from lutris.util.steam.config import get_steamapps_paths
         steamapps_paths = get_steamapps_paths()
-        for platform in ("linux", "windows"):
-            for path in steamapps_paths[platform] if steamapps_paths else []:
-                self._print(command_line, path)
+        if steamapps_paths:
+            self._print(command_line, "\n".join(steamapps_paths))
 
     def do_shutdown(self):  # pylint: disable=arguments-differ
         logger.info("Shutting down Lutris")
@@ -660,6 +729,7 @@ class Application(Gtk.Application):
         """Creates or destroys a tray icon for the application"""
         active = settings.read_setting("show_tray_icon", default="false").lower() == "true"
         if active and not self.tray:
+            from lutris.gui.widgets.status_icon import LutrisStatusIcon
             self.tray = LutrisStatusIcon(application=self)
         if self.tray:
             self.tray.set_visible(active)
@@ -179,6 +179,17 @@ def init_lutris():
             settings.write_setting(service, True, section="services")
 
 
+def is_runtime_check_stale(min_interval_hours=6):
+    """Return whether update_runtime hasn't completed in the last
+    `min_interval_hours`. Setting LUTRIS_FORCE_RUNTIME_UPDATE always
+    makes the check stale.
+    """
+    if os.environ.get("LUTRIS_FORCE_RUNTIME_UPDATE"):
+        return True
+    last_check = update_cache.get_last_call("runtime-check")
+    return not last_check or last_check > 3600 * min_interval_hours
+
+
 def update_runtime(force=False):
     """Update runtime components"""
     runtime_call = update_cache.get_last_call("runtime")
@@ -200,4 +211,5 @@ def update_runtime(force=False):
     if force or not media_call or media_call > 3600 * 24:
         sync_media()
         update_cache.write_date_to_cache("media")
+    update_cache.write_date_to_cache("runtime-check")
     logger.info("Startup complete")
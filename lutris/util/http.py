@@ -47,6 +47,7 @@ class Request:
         self.headers = {"User-Agent": self.user_agent}
         self.response_headers = None
         self.info = None
+        self.response = None
         if headers is None:
             headers = {}
         if not isinstance(headers, dict):
@@ -79,7 +80,10 @@ class Request:
     def user_agent(self):
         return "{} {}".format(PROJECT, VERSION)
 
-    def get(self, data=None):
+    def get(self, data=None, stream=False):
+        """Send a GET request. With `stream` set, the response body isn't read
+        into `content`; it is left open in `response` for `write_to_file`.
+        """
         logger.debug("GET %s", self.url)
         try:
             req = urllib.request.Request(url=self.url, data=data, headers=self.headers)
@@ -107,8 +111,11 @@ class Request:
         except AttributeError:
             self.total_size = 0
 
-        self.content = b"".join(self._iter_chunks(request))
         self.info = request.info()
+        if stream:
+            self.response = request
+            return self
+        self.content = b"".join(self._iter_chunks(request))
         request.close()
         return self
 
@@ -130,8 +137,11 @@ class Request:
         raise NotImplementedError
 
     def write_to_file(self, path):
-        content = self.content
         logger.debug("Writing to %s", path)
+        if self.response:
+            self._stream_to_file(path)
+            return
+        content = self.content
         if not content:
             logger.warning("No content to write")
             return
@@ -141,6 +151,19 @@ class Request:
         with open(path, "wb") as dest_file:
             dest_file.write(content)
 
+    def _stream_to_file(self, path):
+        """Write the pending response body to `path` chunk by chunk"""
+        dirname = os.path.dirname(path)
+        if not system.path_exists(dirname):
+            os.makedirs(dirname)
+        try:
+            with open(path, "wb") as dest_file:
+                for chunk in self._iter_chunks(self.response):
+                    dest_file.write(chunk)
+        finally:
+            self.response.close()
+            self.response = None
+
     @property
     def json(self):
         _raw_json = self.text
@@ -139,3 +139,12 @@ def get_path_from_appmanifest(steamapps_path, appid):
 def get_appmanifests(steamapps_path):
     """Return the list for all appmanifest files in a Steam library folder"""
     return [f for f in os.listdir(steamapps_path) if re.match(r"^appmanifest_\d+.acf$", f)]
+
+
+def get_appmanifest_paths(steamapps_path):
+    """Return the full paths of all appmanifest files in a Steam library folder"""
+    with os.scandir(steamapps_path) as entries:
+        return [
+            entry.path for entry in entries
+            if re.match(r"^appmanifest_\d+.acf$", entry.name) and entry.is_file()
+        ]
@@ -60,6 +60,14 @@ class TestPersonnalGameArchive(DatabaseTester):
         game = games_db.get_game_by_field("some-game", "slug")
         self.assertEqual(game['directory'], '/foo')
 
+    def test_get_game_by_any_field(self):
+        game_id = games_db.add_game(name="some game", runner="linux", installer_slug="some-game-gog")
+        game = games_db.get_game_by_any_field("some-game-gog", ("slug", "installer_slug"))
+        self.assertEqual(game['id'], game_id)
+        game = games_db.get_game_by_any_field(str(game_id))
+        self.assertEqual(game['slug'], "some-game")
+        self.assertEqual(games_db.get_game_by_any_field("unknown"), {})
+
 
 class TestDbCreator(DatabaseTester):
     def test_can_generate_fields(self):